@@ -20,7 +20,7 @@ More information about the SR Linux ACL model schema: https://yang.srlinux.dev/
 """
 
 import sys
-from typing import Dict, List, Set, Tuple
+from typing import Any, Dict, List, Set, Tuple
 
 from aerleon.lib import aclgenerator, openconfig
 from aerleon.lib.policy import Term
@@ -95,18 +95,34 @@ class UnsupportedLogging(Error):
     pass
 
 
+def _CloneMatch(match: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy a match dictionary tree into plain dicts.
+
+    match is a tree of dicts holding only immutable leaves (str, int, bool),
+    so leaves are shared by reference and no memo is needed, unlike copy.deepcopy.
+    """
+    return {k: _CloneMatch(v) if isinstance(v, dict) else v for k, v in match.items()}
+
+
 class SRLTerm(openconfig.Term):
     """Creates the term for the SR Linux ACL."""
 
     ACTION_MAP = {'accept': 'accept', 'deny': 'drop', 'reject': 'drop'}
 
+    def __init__(self, term: Term, inet_version: str = 'inet') -> None:
+        super().__init__(term, inet_version)
+        # OpenConfig has no use for the name and comments, SR Linux sets them once here.
+        self.SetName(term.name)
+        if term.comment:
+            self.SetComments(term.comment)
+
     def SetName(self, name: str) -> None:
         # Put name in description field
         self.term_dict['description'] = name
 
-    def SetAction(self, filter_options: List[str]) -> None:
+    def SetAction(self) -> None:
         action = self.ACTION_MAP[self.term.action[0]]
-        if R24_3_2 in filter_options:
+        if R24_3_2 in self.filter_options:
             self.term_dict['action'] = {action: {}}
             if self.term.logging:
                 self.term_dict['action']['log'] = True
@@ -125,32 +141,32 @@ class SRLTerm(openconfig.Term):
         self.term_dict['_annotate_description'] = "_".join(comments)[:255]
 
     # Handles syntax changes in release 24.3.2 and beyond
-    def _field(self, key, filter_options: List[str]):
-        if R24_3_2 in filter_options:
+    def _field(self, key):
+        if R24_3_2 in self.filter_options:
             if key not in self.term_dict['match']:
                 self.term_dict['match'][key] = {}
             return self.term_dict['match'][key]
         return self.term_dict['match']
 
-    def SetOptions(self, family: str, filter_options: List[str]) -> None:
+    def SetOptions(self, family: str) -> None:
         # Handle various options
         opts = [str(x) for x in self.term.option]
         self.term_dict['match'] = {}
         if ('fragments' in opts) or ('is-fragment' in opts):
-            self._field('ipv4', filter_options)['fragment'] = True
+            self._field('ipv4')['fragment'] = True
         if 'first-fragment' in opts:
-            self._field('ipv4', filter_options)['first-fragment'] = True
+            self._field('ipv4')['first-fragment'] = True
 
         if 'initial' in opts or 'tcp-initial' in opts:
-            self._field('transport', filter_options)['tcp-flags'] = "syn"
+            self._field('transport')['tcp-flags'] = "syn"
         if 'rst' in opts:
-            _f = self._field('transport', filter_options)
+            _f = self._field('transport')
             _f['tcp-flags'] = "syn&rst" if 'tcp-flags' in _f else "rst"
         if 'not-syn-ack' in opts:
-            self._field('transport', filter_options)['tcp-flags'] = "!(syn&ack)"
+            self._field('transport')['tcp-flags'] = "!(syn&ack)"
 
         def _tcp_established():
-            self._field('transport', filter_options)['tcp-flags'] = "ack|rst"
+            self._field('transport')['tcp-flags'] = "ack|rst"
 
         if 'tcp-established' in opts:
             if not self.term.protocol or self.term.protocol == ['tcp']:
@@ -164,9 +180,9 @@ class SRLTerm(openconfig.Term):
                 if self.term.protocol == ['tcp']:
                     _tcp_established()
                 elif self.term.protocol == ['udp']:
-                    self.SetProtocol(family=family, protocol="udp", filter_options=filter_options)
+                    self.SetProtocol(family=family, protocol="udp")
                     if not self.term.destination_port:
-                        self.SetDestPorts(1024, 65535, filter_options)
+                        self.SetDestPorts(1024, 65535)
                 else:  # Could produce 2 rules if [tcp,udp]
                     raise EstablishedWithNonTcpUdpError(
                         f'established can only be used with tcp or udp protocol in term {self.term.name}'
@@ -177,35 +193,42 @@ class SRLTerm(openconfig.Term):
                 )
 
         if 'tcp-flags' in self.term_dict['match'] or (
-            R24_3_2 in filter_options
+            R24_3_2 in self.filter_options
             and 'transport' in self.term_dict['match']
             and 'tcp-flags' in self.term_dict['match']['transport']
         ):
-            self.SetProtocol(family=family, protocol="tcp", filter_options=filter_options)
+            self.SetProtocol(family=family, protocol="tcp")
 
-    def SetSourceAddress(self, family: str, saddr: str, filter_options: List[str]) -> None:
-        self._field(family, filter_options)['source-ip'] = {'prefix': saddr}
+    def SetSourceAddress(self, family: str, saddr: str) -> None:
+        self._field(family)['source-ip'] = {'prefix': saddr}
 
-    def SetDestAddress(self, family: str, daddr: str, filter_options: List[str]) -> None:
-        self._field(family, filter_options)['destination-ip'] = {'prefix': daddr}
+    def SetDestAddress(self, family: str, daddr: str) -> None:
+        self._field(family)['destination-ip'] = {'prefix': daddr}
 
-    def SetSourcePorts(self, start: int, end: int, filter_options: List[str]) -> None:
+    def SetSourcePorts(self, start: int, end: int) -> None:
         if start == end:
             val = {'value': start}
         else:
             val = {'range': {'start': start, 'end': end}}
-        self._field('transport', filter_options)['source-port'] = val
+        self._field('transport')['source-port'] = val
 
-    def SetDestPorts(self, start: int, end: int, filter_options: List[str]) -> None:
+    def SetDestPorts(self, start: int, end: int) -> None:
         if start == end:
             val = {'value': start}
         else:
             val = {'range': {'start': start, 'end': end}}
-        self._field('transport', filter_options)['destination-port'] = val
+        self._field('transport')['destination-port'] = val
 
-    def SetProtocol(self, family: str, protocol: int, filter_options: List[str]) -> None:
+    def SetProtocol(self, family: str, protocol: int) -> None:
         field_name = "protocol" if family == "ipv4" else "next-header"
-        self._field(family, filter_options)[field_name] = protocol
+        self._field(family)[field_name] = protocol
+
+    def _NewACLEntry(self, family: str, sequence_id: int) -> ACLEntry:
+        # Only 'match' changes between exploded entries, and it nests deeper than
+        # the OpenConfig config dicts.
+        rule = {'sequence-id': sequence_id, **self.term_dict}
+        rule['match'] = _CloneMatch(rule['match'])
+        return rule
 
 
 class NokiaSRLinux(openconfig.OpenConfig):
@@ -255,10 +278,10 @@ class NokiaSRLinux(openconfig.OpenConfig):
         for term in terms:
             for term_af in afs:
                 t = SRLTerm(term, term_af)
-                for rule in t.ConvertToDict(filter_options):
-                    self.total_rule_count += 1
-                    rule['sequence-id'] = (len(srl_acl_entries[term_af]) + 1) * 5
-                    srl_acl_entries[term_af].append(rule)
+                # Entries are numbered per address family.
+                rules = t.ConvertToDict(filter_options, start_seq_id=len(srl_acl_entries[term_af]))
+                self.total_rule_count += len(rules)
+                srl_acl_entries[term_af].extend(rules)
         desc = "_".join(hdr_comments)[:255] if hdr_comments else ""
 
         for af in srl_acl_entries.keys():
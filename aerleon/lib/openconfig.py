@@ -20,11 +20,11 @@ More information about the Openconfig ACL model schema:
 http://ops.openconfig.net/branches/models/master/openconfig-acl.html
 """
 
-import copy
+import functools
+import itertools
 import json
 import sys
-from collections import defaultdict
-from typing import Any, DefaultDict, Dict, List, Set, Tuple, Union
+from typing import Dict, List, Set, Tuple, Union
 
 from absl import logging
 
@@ -52,9 +52,12 @@ class TcpEstablishedWithNonTcpError(Error):
     """Raised when the TCP established option is set with a non TCP protocol."""
 
 
-# Graceful handling of dict heierarchy for OpenConfig JSON.
-def RecursiveDict() -> DefaultDict[Any, Any]:
-    return defaultdict(RecursiveDict)
+@functools.lru_cache(maxsize=256)
+def _FormatPortRange(start: int, end: int) -> Union[int, str]:
+    """Format a port range, most policies only use a handful of distinct ranges."""
+    if start == end:
+        return start
+    return f'{start}..{end}'
 
 
 TransportConfig = TypedDict(
@@ -89,6 +92,8 @@ class Term(aclgenerator.Term):
     """Creates the term for the OpenConfig firewall."""
 
     ACTION_MAP = {'accept': 'ACCEPT', 'deny': 'DROP', 'reject': 'REJECT'}
+    # Every acl-entry with the same action shares one read-only actions subtree.
+    _ACTION_SUBTREES = {k: {'config': {'forwarding-action': v}} for k, v in ACTION_MAP.items()}
 
     # OpenConfig ip-protocols always will resolve to an 8-bit int, but these
     # common names are more convenient in a policy file.
@@ -105,8 +110,17 @@ class Term(aclgenerator.Term):
         self.inet_version = inet_version
 
         # Combine (flatten) addresses with their exclusions into a resulting
-        # flattened_saddr, flattened_daddr, flattened_addr.
-        self.term.FlattenAll()
+        # flattened_saddr, flattened_daddr, flattened_addr. Mixed filters build
+        # a Term per address family from the same policy term, only flatten once.
+        if not self.term.flattened:
+            self.term.FlattenAll()
+
+        # The acl-entry skeleton. Setters assign whole subtrees into term_dict,
+        # while the per-ACE fields go into the family and transport config dicts.
+        self.term_dict = {}
+        self._ip_config = {}
+        self._transport_config = {}
+        self.filter_options = []
 
     def __str__(self) -> None:
         """Convert term to a string."""
@@ -120,18 +134,24 @@ class Term(aclgenerator.Term):
         This function permits inheritance."""
         return {'detail-mode': 'BUILTIN', 'builtin-detail': "TCP_ESTABLISHED"}
 
-    def ConvertToDict(self, filter_options: List[str]) -> List[ACLEntry]:
+    def ConvertToDict(self, filter_options: List[str], start_seq_id: int = 0) -> List[ACLEntry]:
         """Convert term to a dictionary.
 
         This is used to get a dictionary describing this term which can be
         output easily as an Openconfig JSON blob. It represents an "acl-entry"
         message from the OpenConfig ACL schema.
 
+        Args:
+          filter_options: list of options from the filter header.
+          start_seq_id: number of acl-entries preceding this term, entries are
+            numbered in steps of 5 from there.
+
         Returns:
           A list of dictionaries that contains all fields necessary to create or
           update a OpenConfig acl-entry.
         """
-        self.term_dict = RecursiveDict()
+        # Setters that need the filter options (eg. SR Linux) read them from here.
+        self.filter_options = filter_options
 
         # Rules will hold all exploded acl-entry dictionaries.
         rules = []
@@ -140,94 +160,75 @@ class Term(aclgenerator.Term):
         term_af = self.AF_MAP.get(self.inet_version)
         family = self.AF_RENAME[term_af]
 
-        self.SetName(self.term.name)
-
         # Action
-        self.SetAction(filter_options)
+        self.SetAction()
+
+        # Resolve every protocol to its number up front, numeric protocols come
+        # from the policy as strings.
+        protos = []
+        for proto in self.term.protocol:
+            if proto in self.PROTO_MAP:
+                protos.append(self.PROTO_MAP[proto])
+            elif str(proto).isdigit():
+                protos.append(int(proto))
+            else:
+                raise OcFirewallError('Protocol %s unknown. Use an integer.' % proto)
 
-        # Ballot fatigue handling for 'any'.
-        saddrs = self.term.GetAddressOfVersion('flattened_saddr', term_af)
-        if not saddrs:
-            saddrs = ['any']
+        # Options
+        self.SetOptions(family)
 
+        # Specialize the explosion to the fields this term matches on. Each field
+        # pairs its setter with the argument tuples to call it with, fields left
+        # as 'any' are not part of the product and their setters never run.
+        fields = []
+        saddrs = self.term.GetAddressOfVersion('flattened_saddr', term_af)
+        if saddrs:
+            fields.append((self.SetSourceAddress, [(family, str(saddr)) for saddr in saddrs]))
         daddrs = self.term.GetAddressOfVersion('flattened_daddr', term_af)
-        if not daddrs:
-            daddrs = ['any']
-
-        sports = self.term.source_port
-        if not sports:
-            sports = [(0, 0)]
-
-        dports = self.term.destination_port
-        if not dports:
-            dports = [(0, 0)]
-
-        protos = self.term.protocol
-        if not protos:
-            protos = ['none']
-
-        self.term_dict = copy.deepcopy(self.term_dict)
-
-        if self.term.comment:
-            self.SetComments(self.term.comment)
-
-        # Options
-        self.SetOptions(family, filter_options)
-
-        # Source Addresses
-        for saddr in saddrs:
-            if saddr != 'any':
-                self.SetSourceAddress(family, str(saddr), filter_options)
-
-            # Destination Addresses
-            for daddr in daddrs:
-                if daddr != 'any':
-                    self.SetDestAddress(family, str(daddr), filter_options)
-
-                # Source Port
-                for start, end in sports:
-                    # 'any' starts and ends with zero.
-                    if not start == end == 0:
-                        self.SetSourcePorts(start, end, filter_options)
-
-                    # Destination Port
-                    for start, end in dports:
-                        if not start == end == 0:
-                            self.SetDestPorts(start, end, filter_options)
-
-                        # Protocol
-                        for proto in protos:
-                            if isinstance(proto, str):
-                                if proto != 'none':
-                                    try:
-                                        proto_num = self.PROTO_MAP[proto]
-                                    except KeyError:
-                                        raise OcFirewallError(
-                                            'Protocol %s unknown. Use an integer.', proto
-                                        )
-                                    self.SetProtocol(family, proto_num, filter_options)
-                            else:
-                                self.SetProtocol(family, proto, filter_options)
-
-                            # This is the business end of ace explosion.
-                            # A dict is a reference type, so deepcopy is actually required.
-                            rules.append(copy.deepcopy(self.term_dict))
+        if daddrs:
+            fields.append((self.SetDestAddress, [(family, str(daddr)) for daddr in daddrs]))
+        if self.term.source_port:
+            fields.append((self.SetSourcePorts, self.term.source_port))
+        if self.term.destination_port:
+            fields.append((self.SetDestPorts, self.term.destination_port))
+        if protos:
+            fields.append((self.SetProtocol, [(family, proto) for proto in protos]))
+        setters = [setter for setter, _ in fields]
+        # The argument tuple each setter last ran with. product() yields the same
+        # tuple objects again, so a setter only reruns when its field changes.
+        applied = [None] * len(fields)
+
+        # Walk the cartesian product of the exploded fields in a single loop.
+        for seq, field_args in enumerate(
+            itertools.product(*[args for _, args in fields]), start=start_seq_id + 1
+        ):
+            for i, args in enumerate(field_args):
+                if args is not applied[i]:
+                    setters[i](*args)
+                    applied[i] = args
+
+            # This is the business end of ace explosion.
+            rules.append(self._NewACLEntry(family, seq * 5))
 
         return rules
 
-    def SetName(self, name: str) -> None:
-        pass
+    def _NewACLEntry(self, family: str, sequence_id: int) -> ACLEntry:
+        """Snapshot the current term_dict as a new acl-entry.
 
-    def SetAction(self, filter_options: List[str]) -> None:
-        action = self.ACTION_MAP[self.term.action[0]]
-        self.term_dict['actions'] = {}
-        self.term_dict['actions']['config'] = {}
-        self.term_dict['actions']['config']['forwarding-action'] = action
+        Only the address family and transport config change between the exploded
+        ACEs of a term, so those are copied and the subtrees of term_dict are shared.
+        """
+        rule = {'sequence-id': sequence_id, **self.term_dict}
+        if self._ip_config:
+            rule[family] = {'config': dict(self._ip_config)}
+        if self._transport_config:
+            rule['transport'] = {'config': dict(self._transport_config)}
+        return rule
 
-    def SetComments(self, comments: List[str]) -> None:
-        pass
+    def SetAction(self) -> None:
+        self.term_dict['actions'] = self._ACTION_SUBTREES[self.term.action[0]]
 
-    def SetOptions(self, family: str, filter_options: List[str]) -> None:
+    def SetOptions(self, family: str) -> None:
         # options, 'family' unused
         if self.term.option:
             if 'tcp-established' in self.term.option:
@@ -235,34 +236,22 @@ class Term(aclgenerator.Term):
                     raise TcpEstablishedWithNonTcpError(
                         f'tcp-established can only be used with tcp protocol in term {self.term.name}'
                     )
-                self.term_dict['transport']['config'].update(self._tcp_established())
+                self._transport_config.update(self._tcp_established())
 
-    def SetSourceAddress(self, family: str, saddr: str, filter_options: List[str]) -> None:
-        self.term_dict[family]['config']['source-address'] = saddr
+    def SetSourceAddress(self, family: str, saddr: str) -> None:
+        self._ip_config['source-address'] = saddr
 
-    def SetDestAddress(self, family: str, daddr: str, filter_options: List[str]) -> None:
-        self.term_dict[family]['config']['destination-address'] = daddr
+    def SetDestAddress(self, family: str, daddr: str) -> None:
+        self._ip_config['destination-address'] = daddr
 
-    def SetSourcePorts(self, start: int, end: int, filter_options: List[str]) -> None:
-        if start == end:
-            self.term_dict['transport']['config']['source-port'] = start
-        else:
-            self.term_dict['transport']['config']['source-port'] = '%d..%d' % (
-                start,
-                end,
-            )
+    def SetSourcePorts(self, start: int, end: int) -> None:
+        self._transport_config['source-port'] = _FormatPortRange(start, end)
 
-    def SetDestPorts(self, start: int, end: int, filter_options: List[str]) -> None:
-        if start == end:
-            self.term_dict['transport']['config']['destination-port'] = start
-        else:
-            self.term_dict['transport']['config']['destination-port'] = '%d..%d' % (
-                start,
-                end,
-            )
+    def SetDestPorts(self, start: int, end: int) -> None:
+        self._transport_config['destination-port'] = _FormatPortRange(start, end)
 
-    def SetProtocol(self, family: str, protocol: int, filter_options: List[str]) -> None:
-        self.term_dict[family]['config']['protocol'] = protocol
+    def SetProtocol(self, family: str, protocol: int) -> None:
+        self._ip_config['protocol'] = protocol
 
 
 class OpenConfig(aclgenerator.ACLGenerator):
@@ -315,10 +304,10 @@ class OpenConfig(aclgenerator.ACLGenerator):
 
             # Get the address family if set.
             address_family = 'inet'
-            for i in self._SUPPORTED_AF:
-                if i in filter_options:
-                    address_family = i
-                    filter_options.remove(i)
+            filter_afs = set(filter_options) & self._SUPPORTED_AF
+            if filter_afs:
+                address_family = filter_afs.pop()
+                filter_options = [i for i in filter_options if i not in self._SUPPORTED_AF]
             self._TranslateTerms(
                 terms, address_family, filter_name, header.comment, filter_options
             )
@@ -348,10 +337,10 @@ class OpenConfig(aclgenerator.ACLGenerator):
                 term_address_families = [address_family]
             for term_af in term_address_families:
                 t = self._TERM(term, term_af)
-                for rule in t.ConvertToDict(filter_options):
-                    self.total_rule_count += 1
-                    rule['sequence-id'] = self.total_rule_count * 5
-                    oc_acl_entries.append(rule)
+                rules = t.ConvertToDict(filter_options, start_seq_id=self.total_rule_count)
+                self.total_rule_count += len(rules)
+                oc_acl_entries.extend(rules)
+
         oc_type = self.FAMILY_MAP[address_family]
         oc_acl_set = {
             "acl-entries": {"acl-entry": oc_acl_entries},
@@ -16,6 +16,7 @@
 """Unittest for OpenConfig rendering module."""
 
 import json
+from unittest import mock
 
 from absl.testing import absltest, parameterized
 
@@ -89,6 +90,13 @@ term bad-tcp-est {
   action:: accept
 }
 """
+GOOD_PROTO_NUMBER = """
+term good-term-1 {
+  comment:: "Allow GRE by number and IPIP."
+  protocol:: 47 ipip
+  action:: accept
+}
+"""
 GOOD_EVERYTHING = """
 term good-term-1 {
   comment:: "Allow TCP & UDP 53 with saddr/daddr."
@@ -527,6 +535,25 @@ class OpenConfigTest(absltest.TestCase):
         self.assertEqual(expected, json.loads(str(acl)))
         print(acl)
 
+    def testProtocolNumber(self):
+        acl = openconfig.OpenConfig(
+            policy.ParsePolicy(GOOD_HEADER + GOOD_PROTO_NUMBER, self.naming), EXP_INFO
+        )
+        entries = json.loads(str(acl))[0]['acl-entries']['acl-entry']
+        self.assertEqual([47, 4], [e['ipv4']['config']['protocol'] for e in entries])
+
+    def testEntriesArePlainDicts(self):
+        acl = openconfig.OpenConfig(
+            policy.ParsePolicy(GOOD_HEADER + GOOD_EVERYTHING + GOOD_TCP_EST, self.naming),
+            EXP_INFO,
+        )
+        for rule in acl.acl_sets[0]['acl-entries']['acl-entry']:
+            self.assertIs(type(rule), dict)
+            self.assertIs(type(rule['actions']), dict)
+            self.assertIs(type(rule['actions']['config']), dict)
+            self.assertIs(type(rule['ipv4']['config']), dict)
+            self.assertIs(type(rule['transport']['config']), dict)
+
     @capture.stdout
     def testV6Saddr(self):
         acl = openconfig.OpenConfig(
@@ -554,6 +581,14 @@ class OpenConfigTest(absltest.TestCase):
         self.assertEqual(expected, json.loads(str(acl)))
         print(acl)
 
+    def testMixedFlattensTermOnce(self):
+        pol = policy.ParsePolicy(GOOD_HEADER_MIXED + GOOD_DADDR, self.naming)
+        with mock.patch.object(
+            policy.Term, 'FlattenAll', autospec=True, side_effect=policy.Term.FlattenAll
+        ) as flatten:
+            openconfig.OpenConfig(pol, EXP_INFO)
+        flatten.assert_called_once()
+
     @capture.stdout
     def testTcpEstablished(self):
         policy_text = GOOD_HEADER + GOOD_TCP_EST